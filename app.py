@@ -1,15 +1,14 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import math
+import matplotlib
+matplotlib.use("Agg") # Headless backend; figures are only rendered to PNG
 import matplotlib.pyplot as plt
 from io import BytesIO
+import threading
 
 # --- PDF GENERATION LIBRARY ---
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
+from pdf_report import generate_pdf
 
 # --- 1. SETUP & CONFIG ---
 st.set_page_config(page_title="Vertex Roofing Calculator", layout="wide")
@@ -24,157 +23,87 @@ CLIMATE_DATA = {
         "rh_in": [66.2, 66.3, 68.5, 70.3, 69.7, 70.4, 72.0, 72.2, 71.3, 70.1, 70.4, 68.6]
     }
 }
+# Monthly series as NumPy arrays for the batched Glaser run (dtype inferred, so whole-number RH still prints as "92%")
+for profile in CLIMATE_DATA.values():
+    for k, v in profile.items():
+        if k != "months": profile[k] = np.asarray(v)
 
-# --- 2. PDF GENERATOR FUNCTION ---
-def generate_pdf(project_name, u_val, risk_result, layers_data, monthly_results=None):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Title
-    elements.append(Paragraph("Vertex Roofing Systems", styles["Title"]))
-    elements.append(Paragraph("Thermal Calculation & Condensation Risk Analysis", styles["Heading2"]))
-    elements.append(Spacer(1, 12))
-
-    # Project Info
-    elements.append(Paragraph(f"<b>Project:</b> {project_name}", styles["Normal"]))
-    elements.append(Spacer(1, 12))
+# --- CACHE KEYS ---
+# Layer dicts are unhashable; cached functions take (name, thickness, lambda, mu, r_vap) tuples
+def layers_to_key(layers):
+    return tuple((l['name'], float(l['thickness']), float(l['lambda']), float(l['mu']), float(l['r_vap'])) for l in layers)
 
-    # Results
-    u_text = f"Calculated U-Value: <b>{u_val:.3f} W/m²K</b>"
-    elements.append(Paragraph(u_text, styles["Normal"]))
-    
-    risk_color = "red" if "FAIL" in risk_result else "green"
-    risk_text = f"Condensation Risk: <font color='{risk_color}'><b>{risk_result}</b></font>"
-    elements.append(Paragraph(risk_text, styles["Normal"]))
-    elements.append(Spacer(1, 20))
-
-    # Layers Table
-    elements.append(Paragraph("<b>Construction Build-Up (Top to Bottom):</b>", styles["Normal"]))
-    elements.append(Spacer(1, 6))
-    
-    table_data = [["Layer Name", "Thickness (mm)", "Lambda (W/mK)", "Mu Value"]]
-    for layer in layers_data:
-        table_data.append([
-            layer['name'], 
-            str(layer['thickness']), 
-            str(layer['lambda']), 
-            str(layer['mu']) if pd.notna(layer['mu']) else "-"
-        ])
+def layers_from_key(layers_key):
+    return [{'name': n, 'thickness': th, 'lambda': lam, 'mu': mu, 'r_vap': rv} for n, th, lam, mu, rv in layers_key]
 
-    t = Table(table_data)
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(t)
-    
-    # Monthly Breakdown
-    if monthly_results:
-        elements.append(PageBreak())
-        elements.append(Paragraph("<b>12-Month Condensation Analysis (Glaser Method)</b>", styles["Heading2"]))
-        elements.append(Spacer(1, 12))
-        
-        m_data = [["Month", "T_out", "RH_out", "Status"]]
-        for m in monthly_results:
-            status = "RISK" if m['risk'] else "Safe"
-            m_data.append([m['month'], f"{m['t_out']} C", f"{m['rh_out']}%", status])
-            
-        mt = Table(m_data)
-        mt.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
-        ]))
-        elements.append(mt)
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+# --- 2. PDF GENERATOR FUNCTION ---
+@st.cache_data
+def generate_pdf_bytes(project_name, u_val, risk_result, layers_key, monthly_key):
+    monthly_results = [{'month': m, 'risk': r, 't_out': to, 'rh_out': rho} for m, r, to, rho in monthly_key]
+    return generate_pdf(project_name, u_val, risk_result, layers_from_key(layers_key), monthly_results).getvalue()
 
 # --- 3. LOAD DATABASE (ROBUST VERSION) ---
-@st.cache_data
+@st.cache_data(persist="disk")
 def load_data():
-    try:
-        df = pd.read_csv("materials.csv")
-        # Ensure numeric columns are actually numbers (convert errors/blanks to NaN)
-        df['Lambda'] = pd.to_numeric(df['Lambda'], errors='coerce')
-        df['Mu'] = pd.to_numeric(df['Mu'], errors='coerce')
-        df['R_Vap'] = pd.to_numeric(df['R_Vap'], errors='coerce')
-        return df
-    except Exception as e:
-        st.error(f"Error loading CSV: {e}")
-        return None
-
-df_materials = load_data()
-if df_materials is None:
+    df = pd.read_csv("materials.csv")
+    # Ensure numeric columns are actually numbers (convert errors/blanks to NaN)
+    df['Lambda'] = pd.to_numeric(df['Lambda'], errors='coerce')
+    df['Mu'] = pd.to_numeric(df['Mu'], errors='coerce')
+    df['R_Vap'] = pd.to_numeric(df['R_Vap'], errors='coerce')
+    return df
+
+@st.cache_resource
+def get_material_tables():
+    # Plain list / arrays indexed by row position, so reruns skip pandas lookups.
+    # cache_resource shares one instance instead of unpickling a copy per rerun, so keep them read-only.
+    df = load_data()
+    names = df['Name'].tolist()
+    name_to_idx = {n: i for i, n in enumerate(names)}
+    columns = [df[c].to_numpy(dtype=np.float64) for c in ('Lambda', 'Mu', 'R_Vap')]
+    for c in columns: c.flags.writeable = False
+    return (names, *columns, name_to_idx)
+
+# Caught outside the cached functions so a missing file is never persisted as a result.
+# Reruns only hit the lookup-table cache; the DataFrame itself is not copied out again.
+try:
+    mat_names, mat_lambda, mat_mu, mat_rvap, name_to_idx = get_material_tables()
+except FileNotFoundError as e:
+    st.error(f"Error loading CSV: {e}")
     st.stop()
 
 # --- 4. PHYSICS ENGINE ---
-def calculate_dewpoint(vp):
-    if vp <= 0: return -50
-    return (237.7 * math.log(vp/610.5)) / (17.27 - math.log(vp/610.5))
+# Lives in physics.py: an imported module keeps its jitted functions across Streamlit reruns
+from physics import run_single_glaser, run_glaser_batch, compute_u_value
 
-def run_single_glaser(layers, t_in, rh_in, t_out, rh_out):
-    psat_in = 610.5 * math.exp((17.27 * t_in) / (237.7 + t_in))
-    pv_in = psat_in * (rh_in / 100)
-    psat_out = 610.5 * math.exp((17.27 * t_out) / (237.7 + t_out))
-    pv_out = psat_out * (rh_out / 100)
-    
-    total_r = 0.14
-    total_rv = 0
-    processed = []
+# --- PROFILE GRAPH ---
+@st.cache_resource
+def get_profile_figure():
+    # One Figure shared by every render; the lock stops concurrent sessions drawing on it at once
+    fig, ax = plt.subplots(figsize=(10, 4))
+    return fig, ax, threading.Lock()
+
+@st.cache_data
+def render_profile_png(layers_key, t_in, rh_in, t_out, rh_out):
+    graph_data, _, _ = run_single_glaser(layers_from_key(layers_key)[::-1], t_in, rh_in, t_out, rh_out)
     
-    for layer in layers:
-        thick_m = layer['thickness'] / 1000
+    fig, ax, lock = get_profile_figure()
+    with lock:
+        ax.clear()
+        ax.plot(graph_data['x'], graph_data['temp'], label="Temperature", color="blue", linewidth=2)
+        ax.plot(graph_data['x'], graph_data['dew'], label="Dew Point", color="red", linestyle="--", linewidth=2)
         
-        # Safe Lambda
-        lam = layer['lambda']
-        if pd.isna(lam) or lam <= 0: lam = 999 # Avoid division by zero
-        r = thick_m / lam
+        ax.fill_between(graph_data['x'], graph_data['temp'], graph_data['dew'], 
+                        where=graph_data['risk_mask'], 
+                        color='red', alpha=0.3, label='Condensation Zone')
         
-        # Safe Vapour Resistance (Logic: Try R_Vap first, then Mu, then Default)
-        r_vap_val = layer['r_vap']
-        mu_val = layer['mu']
+        ax.set_xlabel("Depth from Inside Surface (mm)")
+        ax.set_ylabel("Temp (°C)")
+        ax.legend()
+        ax.grid(True, alpha=0.3)
         
-        if pd.notna(r_vap_val):
-            rv = float(r_vap_val) # Use specific resistance if exists
-        elif pd.notna(mu_val):
-            rv = float(mu_val) * thick_m * 5 # Use Mu if exists
-        else:
-            rv = 1.0 * thick_m * 5 # Fallback: Assume Mu=1 (Air) to prevent crash
-            
-        total_r += r
-        total_rv += rv
-        processed.append({'r': r, 'rv': rv, 'thick': layer['thickness'], 'name': layer['name']})
-
-    points = {'x': [0], 'temp': [t_in], 'dew': [calculate_dewpoint(pv_in)]}
-    curr = {'temp': t_in, 'pv': pv_in, 'x': 0}
-    risk_found = False
-    
-    dt = (t_in - t_out) * (0.10 / total_r)
-    curr['temp'] -= dt
-    points['x'].append(0)
-    points['temp'].append(curr['temp'])
-    points['dew'].append(calculate_dewpoint(curr['pv']))
-
-    for p in processed:
-        dt = (t_in - t_out) * (p['r'] / total_r)
-        dp = (pv_in - pv_out) * (p['rv'] / total_rv) if total_rv > 0 else 0
-        curr['temp'] -= dt
-        curr['pv'] -= dp
-        curr['x'] += p['thick']
-        dp_temp = calculate_dewpoint(curr['pv'])
-        points['x'].append(curr['x'])
-        points['temp'].append(curr['temp'])
-        points['dew'].append(dp_temp)
-        if dp_temp >= curr['temp']: risk_found = True
-            
-    return points, risk_found, 1/total_r
+        buf = BytesIO()
+        fig.savefig(buf, format='png', dpi=100)
+    return buf.getvalue()
 
 # --- 5. INTERFACE ---
 col_header1, col_header2 = st.columns([1, 4])
@@ -193,6 +122,7 @@ st.sidebar.header("Climate Data")
 calc_mode = st.sidebar.radio("Calculation Mode", ["Manual Input", "Annual Cycle (Galway)"])
 
 t_in, rh_in, t_out, rh_out = 20.0, 66.2, -2.2, 92.0 # Defaults
+fast_mode = False
 
 if calc_mode == "Manual Input":
     st.sidebar.subheader("Manual Conditions")
@@ -202,12 +132,14 @@ if calc_mode == "Manual Input":
     rh_out = st.sidebar.number_input("Outside RH (%)", 92.0)
 else:
     st.sidebar.info("Using 12-month climate data from ISO 13788 (Galway Profile).")
+    fast_mode = st.sidebar.checkbox("Fast pass/fail (stop at first risk)")
 
 # --- LAYERS LOGIC ---
 if 'layers' not in st.session_state:
-    st.session_state.layers = [{'name': 'Aluminium', 'thick': 1.0}, {'name': 'Kingspan TR26', 'thick': 100.0}, {'name': 'CLT Panel', 'thick': 160.0}]
+    # Layers hold the material's row position, so widgets never search by name
+    st.session_state.layers = [{'idx': name_to_idx.get('Aluminium', 0), 'thick': 1.0}, {'idx': name_to_idx.get('Kingspan TR26', 0), 'thick': 100.0}, {'idx': name_to_idx.get('CLT Panel', 0), 'thick': 160.0}]
 
-def add_layer(): st.session_state.layers.append({'name': 'Siga Wetguard', 'thick': 0.6})
+def add_layer(): st.session_state.layers.append({'idx': name_to_idx.get('Siga Wetguard', 0), 'thick': 0.6})
 def remove_layer(): 
     if len(st.session_state.layers) > 0: st.session_state.layers.pop()
 
@@ -222,71 +154,64 @@ calc_layers = []
 for i, layer in enumerate(st.session_state.layers):
     c1, c2 = st.columns([3, 1])
     with c1:
-        if layer['name'] in df_materials['Name'].values:
-            idx = df_materials[df_materials['Name'] == layer['name']].index[0]
-        else:
-            idx = 0
-        new_name = st.selectbox(f"Layer {i+1}", df_materials['Name'], index=int(idx), key=f"mat_{i}")
+        new_idx = st.selectbox(f"Layer {i+1}", range(len(mat_names)), index=layer['idx'], format_func=lambda m: mat_names[m], key=f"mat_{i}")
     with c2:
         new_thick = st.number_input(f"Thickness (mm)", value=float(layer['thick']), min_value=0.0, step=0.1, format="%.1f", key=f"th_{i}")
     
-    props = df_materials[df_materials['Name'] == new_name].iloc[0]
-    calc_layers.append({'name': new_name, 'thickness': new_thick, 'lambda': props['Lambda'], 'mu': props['Mu'], 'r_vap': props['R_Vap']})
+    calc_layers.append({'name': mat_names[new_idx], 'thickness': new_thick, 'lambda': mat_lambda[new_idx], 'mu': mat_mu[new_idx], 'r_vap': mat_rvap[new_idx]})
 
 st.write("---")
 
 # --- 6. RUN & EXPORT ---
 if st.button("RUN CALCULATIONS", type="primary", use_container_width=True):
     
+    layers_key = layers_to_key(calc_layers)
+    calc_layers_rev = calc_layers[::-1] # Physics runs inside to outside
+    
     # 1. U-Value (Standard check)
-    _, _, u_val = run_single_glaser(calc_layers[::-1], 20, 50, 0, 80)
+    u_val = compute_u_value(calc_layers)
     
     final_risk_msg = "NONE (Safe)"
     graph_data = None
+    graph_cond = None
     monthly_report = []
 
     # 2. RUN ANALYSIS BASED ON MODE
     if calc_mode == "Manual Input":
-        points, risk, _ = run_single_glaser(calc_layers[::-1], t_in, rh_in, t_out, rh_out)
+        points, risk, _ = run_single_glaser(calc_layers_rev, t_in, rh_in, t_out, rh_out)
         graph_data = points
+        graph_cond = (t_in, rh_in, t_out, rh_out)
         if risk: final_risk_msg = "FAIL (Risk Detected)"
         
     else:
-        # Run 12 times (Galway Cycle)
+        # All 12 months (Galway Cycle) in one batched Glaser run
         months = CLIMATE_DATA["Galway (ISO 13788)"]
+        batch, batch_risk, _ = run_glaser_batch(calc_layers_rev, months["temp_in"], months["rh_in"], months["temp_out"], months["rh_out"], stop_on_risk=fast_mode)
         risky_months = []
-        worst_points = None
-        max_overlap = 0 
         
-        for i in range(12):
+        for i in range(len(batch_risk)):
             m_name = months["months"][i]
-            ti = months["temp_in"][i]
-            rhi = months["rh_in"][i]
-            to = months["temp_out"][i]
-            rho = months["rh_out"][i]
-            
-            pts, is_risk, _ = run_single_glaser(calc_layers[::-1], ti, rhi, to, rho)
-            monthly_report.append({'month': m_name, 'risk': is_risk, 't_out': to, 'rh_out': rho})
-            
-            # Track worst visual month
-            overlap_score = np.sum(np.maximum(0, np.array(pts['dew']) - np.array(pts['temp'])))
-            
-            if overlap_score >= max_overlap:
-                max_overlap = overlap_score
-                worst_points = pts
-                worst_month_name = m_name
-                if worst_points is None: worst_points = pts # Ensure we always have data
-            
+            is_risk = bool(batch_risk[i])
+            monthly_report.append({'month': m_name, 'risk': is_risk, 't_out': months["temp_out"][i], 'rh_out': months["rh_out"][i]})
             if is_risk:
                 risky_months.append(m_name)
         
-        if worst_points is None: worst_points = pts # Fallback
+        if fast_mode and risky_months:
+            # Stopped at the first risky month; graph that one, no overlap scoring needed
+            w = len(batch_risk) - 1
+        else:
+            # Worst visual month: largest dew-over-temp overlap, latest month on ties
+            overlap_scores = np.maximum(0, batch['dew'] - batch['temp']).sum(axis=1)
+            w = len(overlap_scores) - 1 - int(overlap_scores[::-1].argmax())
+        worst_points = {'x': batch['x'], 'temp': batch['temp'][w], 'dew': batch['dew'][w], 'risk_mask': batch['risk_mask'][w]}
+        worst_month_name = months["months"][w]
+        graph_cond = (months["temp_in"][w], months["rh_in"][w], months["temp_out"][w], months["rh_out"][w])
 
         if len(risky_months) > 0:
             final_risk_msg = f"FAIL (Risk in {', '.join(risky_months)})"
             graph_data = worst_points
             st.warning(f"⚠️ Condensation Risk detected during: {', '.join(risky_months)}")
-            st.write(f"Graph shows worst case month: **{worst_month_name}**")
+            st.write(f"Graph shows {'first risk' if fast_mode else 'worst case'} month: **{worst_month_name}**")
         else:
             final_risk_msg = "NONE (Safe Year-Round)"
             graph_data = worst_points
@@ -299,22 +224,11 @@ if st.button("RUN CALCULATIONS", type="primary", use_container_width=True):
     m3.metric("Project", project_name)
     
     if graph_data:
-        fig, ax = plt.subplots(figsize=(10, 4))
-        ax.plot(graph_data['x'], graph_data['temp'], label="Temperature", color="blue", linewidth=2)
-        ax.plot(graph_data['x'], graph_data['dew'], label="Dew Point", color="red", linestyle="--", linewidth=2)
-        
-        ax.fill_between(graph_data['x'], graph_data['temp'], graph_data['dew'], 
-                        where=(np.array(graph_data['dew']) > np.array(graph_data['temp'])), 
-                        color='red', alpha=0.3, label='Condensation Zone')
-        
-        ax.set_xlabel("Depth from Inside Surface (mm)")
-        ax.set_ylabel("Temp (°C)")
-        ax.legend()
-        ax.grid(True, alpha=0.3)
-        st.pyplot(fig)
+        st.image(render_profile_png(layers_key, *graph_cond))
 
     # 4. PDF EXPORT
-    pdf_buffer = generate_pdf(project_name, u_val, final_risk_msg, calc_layers, monthly_report)
+    monthly_key = tuple((m['month'], m['risk'], m['t_out'], m['rh_out']) for m in monthly_report)
+    pdf_buffer = generate_pdf_bytes(project_name, float(u_val), final_risk_msg, layers_key, monthly_key)
     
     st.download_button(
         label="📄 Download Official PDF Report",
@@ -0,0 +1,83 @@
+import math
+from io import BytesIO
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.pagesizes import A4
+
+# --- PDF GENERATOR ---
+# Report styles never change, so build them once per process
+PDF_STYLES = getSampleStyleSheet()
+LAYER_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+MONTH_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+])
+
+def generate_pdf(project_name, u_val, risk_result, layers_data, monthly_results=None):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+    styles = PDF_STYLES
+
+    # Title
+    elements.append(Paragraph("Vertex Roofing Systems", styles["Title"]))
+    elements.append(Paragraph("Thermal Calculation & Condensation Risk Analysis", styles["Heading2"]))
+    elements.append(Spacer(1, 12))
+
+    # Project Info
+    elements.append(Paragraph(f"<b>Project:</b> {project_name}", styles["Normal"]))
+    elements.append(Spacer(1, 12))
+
+    # Results
+    u_text = f"Calculated U-Value: <b>{u_val:.3f} W/m²K</b>"
+    elements.append(Paragraph(u_text, styles["Normal"]))
+    
+    risk_color = "red" if "FAIL" in risk_result else "green"
+    risk_text = f"Condensation Risk: <font color='{risk_color}'><b>{risk_result}</b></font>"
+    elements.append(Paragraph(risk_text, styles["Normal"]))
+    elements.append(Spacer(1, 20))
+
+    # Layers Table
+    elements.append(Paragraph("<b>Construction Build-Up (Top to Bottom):</b>", styles["Normal"]))
+    elements.append(Spacer(1, 6))
+    
+    table_data = [["Layer Name", "Thickness (mm)", "Lambda (W/mK)", "Mu Value"]]
+    for layer in layers_data:
+        table_data.append([
+            layer['name'], 
+            str(layer['thickness']), 
+            str(layer['lambda']), 
+            "-" if math.isnan(layer['mu']) else str(layer['mu'])
+        ])
+
+    t = Table(table_data)
+    t.setStyle(LAYER_TABLE_STYLE)
+    elements.append(t)
+    
+    # Monthly Breakdown
+    if monthly_results:
+        elements.append(PageBreak())
+        elements.append(Paragraph("<b>12-Month Condensation Analysis (Glaser Method)</b>", styles["Heading2"]))
+        elements.append(Spacer(1, 12))
+        
+        m_data = [["Month", "T_out", "RH_out", "Status"]] + [
+            [m['month'], f"{m['t_out']} C", f"{m['rh_out']}%", "RISK" if m['risk'] else "Safe"]
+            for m in monthly_results
+        ]
+            
+        mt = Table(m_data)
+        mt.setStyle(MONTH_TABLE_STYLE)
+        elements.append(mt)
+
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
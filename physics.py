@@ -0,0 +1,131 @@
+import math
+from functools import lru_cache
+import numpy as np
+from numba import njit
+
+# --- PHYSICS ENGINE (Glaser method) ---
+# fastmath=True minus 'nnan'/'ninf': blank CSV cells arrive as NaN and must survive np.isnan
+FAST_FLAGS = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+# Magnus curve tabulated at 0.1 °C over ordinary building climates; linear
+# interpolation of psat is within ~1e-5 relative, far below the method's physical uncertainty
+T_GRID = np.linspace(-30.0, 40.0, 701)
+PSAT_GRID = 610.5 * np.exp((17.27 * T_GRID) / (237.7 + T_GRID))
+
+@njit(cache=True, fastmath=FAST_FLAGS)
+def saturation_pressure(t):
+    if t < T_GRID[0] or t > T_GRID[-1]:
+        return 610.5 * math.exp((17.27 * t) / (237.7 + t))
+    return np.interp(t, T_GRID, PSAT_GRID)
+
+@njit(cache=True, fastmath=FAST_FLAGS)
+def calculate_dewpoint(vp):
+    if vp <= 0: return -50.0
+    if vp < PSAT_GRID[0] or vp > PSAT_GRID[-1]:
+        l = math.log(vp / 610.5)
+        return (237.7 * l) / (17.27 - l)
+    # Table seed plus one Newton step on the exact Magnus curve (one exp, no logs)
+    t0 = np.interp(vp, PSAT_GRID, T_GRID)
+    psat = 610.5 * math.exp((17.27 * t0) / (237.7 + t0))
+    dpsat_dt = psat * (17.27 * 237.7) / ((237.7 + t0) * (237.7 + t0))
+    return t0 - (psat - vp) / dpsat_dt
+
+@njit(cache=True, fastmath=FAST_FLAGS)
+def _thermal_resistances(thick, lam):
+    # Safe Lambda
+    lam = np.where(np.isnan(lam) | (lam <= 0), 999.0, lam) # Avoid division by zero
+    return (thick / 1000) / lam
+
+@njit(cache=True, fastmath=FAST_FLAGS)
+def _physics_kernel(thick, lam, mu, r_vap, t_in, rh_in, t_out, rh_out, stop_on_risk):
+    # Climate inputs are arrays; row k of temp/dew is the profile for conditions k.
+    # With stop_on_risk the outputs end at the first condition that shows a risk.
+    thick_m = thick / 1000
+    r = _thermal_resistances(thick, lam)
+    
+    # Safe Vapour Resistance (Logic: Try R_Vap first, then Mu, then Default)
+    mu = np.where(np.isnan(mu), 1.0, mu) # Fallback: Assume Mu=1 (Air) to prevent crash
+    rv = np.where(np.isnan(r_vap), mu * thick_m * 5, r_vap)
+    
+    total_r = 0.14 + r.sum()
+    total_rv = rv.sum()
+    inv_r = 1.0 / total_r
+    inv_rv = 1.0 / total_rv if total_rv > 0 else 0.0
+    
+    # Profile points: inside air, inside surface (Rsi = 0.10), then each layer interface
+    n = len(thick)
+    n_cond = len(t_in)
+    x = np.empty(n + 2)
+    x[0] = x[1] = 0.0
+    for i in range(n):
+        x[i + 2] = x[i + 1] + thick[i]
+    
+    temp = np.empty((n_cond, n + 2))
+    dew = np.empty((n_cond, n + 2))
+    # Shared by risk detection (layer interfaces only) and the graph's condensation fill
+    risk_mask = np.empty((n_cond, n + 2), dtype=np.bool_)
+    risk_found = np.zeros(n_cond, dtype=np.bool_)
+    n_done = n_cond
+    for k in range(n_cond):
+        pv_in = saturation_pressure(t_in[k]) * (rh_in[k] / 100)
+        pv_out = saturation_pressure(t_out[k]) * (rh_out[k] / 100)
+        
+        # Loop invariants
+        d_t = t_in[k] - t_out[k]
+        d_pv = pv_in - pv_out
+        
+        temp[k, 0] = t_in[k]
+        temp[k, 1] = t_in[k] - d_t * 0.10 * inv_r
+        dew[k, 0] = dew[k, 1] = calculate_dewpoint(pv_in)
+        
+        pv = pv_in
+        for i in range(n):
+            pv -= d_pv * rv[i] * inv_rv
+            temp[k, i + 2] = temp[k, i + 1] - d_t * r[i] * inv_r
+            dew[k, i + 2] = calculate_dewpoint(pv)
+        
+        risk_mask[k] = dew[k] >= temp[k]
+        risk_found[k] = risk_mask[k, 2:].any()
+        if stop_on_risk and risk_found[k]:
+            n_done = k + 1
+            break
+    return x, temp[:n_done], dew[:n_done], risk_mask[:n_done], risk_found[:n_done], inv_r
+
+# Numba specialises on dtypes, not layer counts, so one tiny call at import compiles (or loads
+# from the on-disk cache) the kernel every build uses, instead of stalling the first RUN click
+_physics_kernel(*[np.zeros(1) for _ in range(8)], False)
+
+def _cache_key(values):
+    # NaN never equals itself, so blanks are keyed as None (np.array turns None back into NaN)
+    return tuple(None if math.isnan(v) else float(v) for v in values)
+
+@lru_cache(maxsize=512)
+def _glaser_cached(thick, lam, mu, r_vap, t_in, rh_in, t_out, rh_out, stop_on_risk):
+    args = [np.array(a, dtype=np.float64) for a in (thick, lam, mu, r_vap, t_in, rh_in, t_out, rh_out)]
+    result = _physics_kernel(*args, stop_on_risk)
+    for a in result[:-1]: a.flags.writeable = False # Shared between callers via the cache
+    return result
+
+def run_glaser_batch(layers, t_in, rh_in, t_out, rh_out, stop_on_risk=False):
+    # One profile per entry of the climate arrays (e.g. the 12 months of a cycle);
+    # stop_on_risk trims the results after the first risky entry (pass/fail only)
+    x, temp, dew, risk_mask, risk_found, u_val = _glaser_cached(
+        _cache_key(layer['thickness'] for layer in layers),
+        _cache_key(layer['lambda'] for layer in layers),
+        _cache_key(layer['mu'] for layer in layers),
+        _cache_key(layer['r_vap'] for layer in layers),
+        *(_cache_key(np.ravel(c)) for c in (t_in, rh_in, t_out, rh_out)),
+        stop_on_risk)
+    points = {'x': x, 'temp': temp, 'dew': dew, 'risk_mask': risk_mask}
+    return points, risk_found, u_val
+
+def compute_u_value(layers):
+    # Only geometry and lambda matter, so no climate run is needed
+    thick = np.array([layer['thickness'] for layer in layers], dtype=np.float64)
+    lam = np.array([layer['lambda'] for layer in layers], dtype=np.float64)
+    return 1.0 / (0.14 + _thermal_resistances(thick, lam).sum())
+
+def run_single_glaser(layers, t_in, rh_in, t_out, rh_out):
+    batch, risk_found, u_val = run_glaser_batch(layers, [t_in], [rh_in], [t_out], [rh_out])
+    points = {'x': batch['x'], 'temp': batch['temp'][0], 'dew': batch['dew'][0], 'risk_mask': batch['risk_mask'][0]}
+    return points, bool(risk_found[0]), u_val